@@ -1,11 +1,16 @@
+import collections
+import concurrent.futures
+import ctypes
+import itertools
 import logging
 import os
 import random
+import shutil
 import signal
 import subprocess
+import struct
 import sys
 import time
-import wave
 from typing import List, Optional
 import pyaudio
 import threading
@@ -19,6 +24,199 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# evdev is optional (only needed for the uinput typing path). Import it once
+# and build the key tables at module scope so they aren't reconstructed on
+# every call to type_text_uinput.
+try:
+    from evdev import UInput, ecodes as _e
+
+    # Comprehensive key mapping for all common characters
+    KEY_MAP = {
+        # Letters
+        "a": _e.KEY_A,
+        "b": _e.KEY_B,
+        "c": _e.KEY_C,
+        "d": _e.KEY_D,
+        "e": _e.KEY_E,
+        "f": _e.KEY_F,
+        "g": _e.KEY_G,
+        "h": _e.KEY_H,
+        "i": _e.KEY_I,
+        "j": _e.KEY_J,
+        "k": _e.KEY_K,
+        "l": _e.KEY_L,
+        "m": _e.KEY_M,
+        "n": _e.KEY_N,
+        "o": _e.KEY_O,
+        "p": _e.KEY_P,
+        "q": _e.KEY_Q,
+        "r": _e.KEY_R,
+        "s": _e.KEY_S,
+        "t": _e.KEY_T,
+        "u": _e.KEY_U,
+        "v": _e.KEY_V,
+        "w": _e.KEY_W,
+        "x": _e.KEY_X,
+        "y": _e.KEY_Y,
+        "z": _e.KEY_Z,
+        # Numbers
+        "0": _e.KEY_0,
+        "1": _e.KEY_1,
+        "2": _e.KEY_2,
+        "3": _e.KEY_3,
+        "4": _e.KEY_4,
+        "5": _e.KEY_5,
+        "6": _e.KEY_6,
+        "7": _e.KEY_7,
+        "8": _e.KEY_8,
+        "9": _e.KEY_9,
+        # Basic punctuation (no shift)
+        " ": _e.KEY_SPACE,
+        ".": _e.KEY_DOT,
+        ",": _e.KEY_COMMA,
+        "-": _e.KEY_MINUS,
+        "=": _e.KEY_EQUAL,
+        "[": _e.KEY_LEFTBRACE,
+        "]": _e.KEY_RIGHTBRACE,
+        ";": _e.KEY_SEMICOLON,
+        "'": _e.KEY_APOSTROPHE,
+        "\\": _e.KEY_BACKSLASH,
+        "/": _e.KEY_SLASH,
+        "`": _e.KEY_GRAVE,
+    }
+
+    # Characters that require shift key (base key mapping)
+    SHIFT_KEY_MAP = {
+        "!": _e.KEY_1,
+        "@": _e.KEY_2,
+        "#": _e.KEY_3,
+        "$": _e.KEY_4,
+        "%": _e.KEY_5,
+        "^": _e.KEY_6,
+        "&": _e.KEY_7,
+        "*": _e.KEY_8,
+        "(": _e.KEY_9,
+        ")": _e.KEY_0,
+        "_": _e.KEY_MINUS,
+        "+": _e.KEY_EQUAL,
+        "{": _e.KEY_LEFTBRACE,
+        "}": _e.KEY_RIGHTBRACE,
+        ":": _e.KEY_SEMICOLON,
+        '"': _e.KEY_APOSTROPHE,
+        "|": _e.KEY_BACKSLASH,
+        "?": _e.KEY_SLASH,
+        "~": _e.KEY_GRAVE,
+        "<": _e.KEY_COMMA,
+        ">": _e.KEY_DOT,
+    }
+
+    # Flyweight dispatch table: ASCII codepoint -> (keycode, needs_shift).
+    # Built once from the maps above so the typing loop is a single index
+    # plus tuple unpack per character (no .lower(), no set/dict lookups).
+    CHAR_TABLE: List[Optional[tuple]] = [None] * 128
+    for _char, _key in KEY_MAP.items():
+        CHAR_TABLE[ord(_char)] = (_key, False)
+        _upper = _char.upper()
+        if _upper != _char:
+            CHAR_TABLE[ord(_upper)] = (_key, True)
+    for _char, _key in SHIFT_KEY_MAP.items():
+        CHAR_TABLE[ord(_char)] = (_key, True)
+
+    _HAS_EVDEV = True
+except ImportError:
+    _HAS_EVDEV = False
+
+# jeepney is optional: when available, notifications go over a persistent
+# D-Bus connection instead of forking notify-send for every event.
+try:
+    from jeepney import DBusAddress, new_method_call
+    from jeepney.io.blocking import open_dbus_connection
+
+    _NOTIFY_ADDR = DBusAddress(
+        "/org/freedesktop/Notifications",
+        bus_name="org.freedesktop.Notifications",
+        interface="org.freedesktop.Notifications",
+    )
+    _HAS_JEEPNEY = True
+except ImportError:
+    _HAS_JEEPNEY = False
+
+_dbus_conn = None
+
+
+def _notify_dbus(title: str, body: str, icon: str) -> bool:
+    """Send a desktop notification over a cached D-Bus session connection.
+
+    Returns False (and drops the cached connection) on any failure so the
+    caller can fall back to notify-send.
+    """
+    global _dbus_conn
+    try:
+        if _dbus_conn is None:
+            _dbus_conn = open_dbus_connection(bus="SESSION")
+        msg = new_method_call(
+            _NOTIFY_ADDR,
+            "Notify",
+            "susssasa{sv}i",
+            (
+                "stt",
+                0,
+                icon,
+                title,
+                body,
+                [],
+                {"transient": ("b", True)},
+                500,
+            ),
+        )
+        # Fire-and-forget: no need to wait for the notification id
+        _dbus_conn.send(msg)
+        return True
+    except Exception as e:
+        logger.debug(f"D-Bus notification failed: {e}")
+        _dbus_conn = None
+        return False
+
+
+# libcanberra via ctypes: one long-lived playback context instead of spawning
+# canberra-gtk-play (a GTK app with ~50ms startup) for every feedback event
+_ca_lib = None
+_ca_ctx = None
+_ca_failed = False
+
+
+def _play_sound_canberra(sound: str) -> bool:
+    """Play a sound-theme event through a persistent libcanberra context.
+
+    Returns False (and stops trying) if libcanberra is unavailable so the
+    caller can fall back to canberra-gtk-play.
+    """
+    global _ca_lib, _ca_ctx, _ca_failed
+    if _ca_failed:
+        return False
+    try:
+        if _ca_lib is None:
+            _ca_lib = ctypes.CDLL("libcanberra.so.0")
+            ctx = ctypes.c_void_p()
+            if _ca_lib.ca_context_create(ctypes.byref(ctx)) != 0:
+                raise OSError("ca_context_create failed")
+            _ca_ctx = ctx
+        # ca_context_play takes a NULL-terminated property list
+        return _ca_lib.ca_context_play(_ca_ctx, 0, b"event.id", sound.encode(), None) == 0
+    except Exception as e:
+        logger.debug(f"libcanberra playback failed: {e}")
+        _ca_failed = True
+        return False
+
+
+# Probe external tools once at import so unavailable methods are skipped
+# without a failed exec attempt on every call
+_HAS_WL_COPY = shutil.which("wl-copy") is not None
+_HAS_WTYPE = shutil.which("wtype") is not None
+_HAS_YDOTOOL = shutil.which("ydotool") is not None
+_HAS_NOTIFY_SEND = shutil.which("notify-send") is not None
+_HAS_CANBERRA = shutil.which("canberra-gtk-play") is not None
+
 
 class ModelManager:
     """Manages Gemini models with rotation for STT transcription."""
@@ -145,11 +343,25 @@ class ModelManager:
 class APIKeyManager:
     """Manages multiple API keys with rotation and retry logic."""
 
+    # How long a key stays out of rotation after a rate-limit/server error
+    RATE_LIMIT_COOLDOWN = 30.0
+    # Auth-class failures (bad key) are effectively permanent
+    AUTH_COOLDOWN = 1e9
+
     def __init__(self):
         self.api_keys: List[str] = []
-        self.failed_keys: set = set()
+        # key -> monotonic timestamp when it becomes eligible again
+        self._cooldown: dict = {}
         self.current_key: Optional[str] = None
+        self._clients: dict = {}
         self._load_api_keys()
+        # Maintained incrementally by mark_failed/mark_success so get_key and
+        # get_remaining_count don't rebuild a filtered list on every call
+        self._available_keys: List[str] = list(self.api_keys)
+        # "round-robin" (default) spreads load evenly across keys; "random"
+        # keeps the old behavior, which can cluster on one key in small pools
+        self.selection_strategy = os.getenv("STT_KEY_STRATEGY", "round-robin")
+        self._rotation = itertools.cycle(self.api_keys) if self.api_keys else None
 
     def _load_api_keys(self):
         """Load API keys from environment variables."""
@@ -178,39 +390,80 @@ class APIKeyManager:
 
         logger.info(f"Loaded {len(self.api_keys)} API key(s)")
 
+    def _rebuild_available(self):
+        """Rebuild the available-key list after a cooldown change."""
+        now = time.monotonic()
+        self._available_keys = [
+            k for k in self.api_keys if self._cooldown.get(k, 0) <= now
+        ]
+
+    def _expire_cooldowns(self):
+        """Return keys whose cooldown has elapsed to the pool."""
+        now = time.monotonic()
+        expired = [k for k, until in self._cooldown.items() if until <= now]
+        if expired:
+            for key in expired:
+                del self._cooldown[key]
+            self._rebuild_available()
+
     def get_key(self) -> Optional[str]:
-        """Get a random API key that hasn't failed recently."""
+        """Get the next API key that isn't cooling down."""
         if not self.api_keys:
             return None
 
-        # Filter out recently failed keys
-        available_keys = [k for k in self.api_keys if k not in self.failed_keys]
+        self._expire_cooldowns()
 
-        if not available_keys:
-            # All keys failed, reset and try again
-            logger.warning("All API keys failed recently, resetting failed status")
-            self.failed_keys.clear()
-            available_keys = self.api_keys
+        if not self._available_keys:
+            # Every key is cooling down - reset rather than stall
+            logger.warning("All API keys cooling down, resetting cooldowns")
+            self._cooldown.clear()
+            self._rebuild_available()
 
-        # Random selection for load balancing
-        self.current_key = random.choice(available_keys)
+        if self.selection_strategy == "random":
+            self.current_key = random.choice(self._available_keys)
+        else:
+            # Round-robin over the full key list, skipping cooling keys
+            for _ in range(len(self.api_keys)):
+                key = next(self._rotation)
+                if key not in self._cooldown:
+                    self.current_key = key
+                    break
+            else:
+                self.current_key = self._available_keys[0]
         return self.current_key
 
-    def mark_failed(self, key: str):
-        """Mark a key as failed."""
+    def get_client(self, key: str):
+        """Get a cached Gemini client for a key, creating it on first use.
+
+        Reusing clients keeps TLS sessions and connection pools alive across
+        retries instead of re-initializing them per attempt.
+        """
+        client = self._clients.get(key)
+        if client is None:
+            client = genai.Client(api_key=key)
+            self._clients[key] = client
+        return client
+
+    def mark_failed(self, key: str, permanent: bool = False):
+        """Put a key on cooldown; permanent for auth-class failures."""
         if key in self.api_keys:
-            self.failed_keys.add(key)
+            duration = self.AUTH_COOLDOWN if permanent else self.RATE_LIMIT_COOLDOWN
+            self._cooldown[key] = time.monotonic() + duration
+            self._rebuild_available()
             logger.warning(
-                f"Marked API key as failed ({len(self.failed_keys)}/{len(self.api_keys)} failed)"
+                f"Marked API key as failed ({len(self._cooldown)}/{len(self.api_keys)} cooling down)"
             )
 
     def mark_success(self, key: str):
-        """Mark a key as successful (remove from failed set)."""
-        self.failed_keys.discard(key)
+        """Mark a key as successful (clear any cooldown)."""
+        if key in self._cooldown:
+            del self._cooldown[key]
+            self._rebuild_available()
 
     def get_remaining_count(self) -> int:
-        """Get count of available (non-failed) keys."""
-        return len([k for k in self.api_keys if k not in self.failed_keys])
+        """Get count of available (non-cooling) keys."""
+        self._expire_cooldowns()
+        return len(self._available_keys)
 
 
 def check_and_set_mic_volume():
@@ -335,8 +588,9 @@ def feedback(event: str, message: str = ""):
         event, ("stt: STT Typer", message, "dialog-information", "bell")
     )
 
-    # Visual notification via notify-send (auto-dismiss quickly, don't persist)
-    try:
+    # Visual notification (auto-dismiss quickly, don't persist): use the
+    # persistent D-Bus connection when possible, else spawn notify-send
+    if not (_HAS_JEEPNEY and _notify_dbus(title, body, icon)) and _HAS_NOTIFY_SEND:
         subprocess.Popen(
             [
                 "notify-send",
@@ -352,18 +606,15 @@ def feedback(event: str, message: str = ""):
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
         )
-    except FileNotFoundError:
-        pass  # notify-send not installed, skip silently
 
-    # Audio feedback via canberra-gtk-play (uses system sound theme)
-    try:
+    # Audio feedback (uses system sound theme): persistent libcanberra
+    # context when available, else spawn canberra-gtk-play
+    if not _play_sound_canberra(sound) and _HAS_CANBERRA:
         subprocess.Popen(
             ["canberra-gtk-play", "-i", sound],
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
         )
-    except FileNotFoundError:
-        pass  # canberra-gtk-play not installed, skip silently
 
 
 # Initialize managers
@@ -374,14 +625,32 @@ api_key_manager = APIKeyManager()
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 16000
+# Capture chunk size in frames; larger chunks mean fewer wake-ups per second
+# (2048 frames at 16kHz is 128ms of audio, inaudible for speech). Tunable for
+# slower hardware via STT_CHUNK_SIZE.
+CHUNK = int(os.getenv("STT_CHUNK_SIZE", "2048"))
+MAX_SECONDS = 60  # Hard cap on recording length (bounds the capture buffer)
+# Spill path for the large-recording upload fallback; normal recordings
+# stay in memory and never touch disk
 AUDIO_FILE = "/tmp/stt_recording.wav"
+# Requests with inline audio are limited to 20MB total; larger recordings
+# fall back to the Files API upload path
+INLINE_AUDIO_LIMIT = 20 * 1024 * 1024
 
 # Bengali mode flag
 BENGALI_MODE = os.getenv("BENGALI_MODE", "0") == "1"
 
+# Speculative racing: send the same request through two API keys in parallel
+# and take whichever answers first. Costs up to 2x API usage per
+# transcription, so it is opt-in.
+SPECULATIVE = os.getenv("STT_SPECULATIVE", "0") == "1"
+
 # Global variables for recording control
 recording = False
 record_thread = None
+# Finished recording (complete WAV bytes) handed from record_audio to
+# transcribe_audio without going through disk
+recorded_wav = None
 
 
 def signal_handler(signum, frame):
@@ -400,130 +669,105 @@ def cleanup_audio_file():
         logger.error(f"Error cleaning up audio file: {e}")
 
 
+def _wav_header(data_size: int) -> bytes:
+    """Build the 44-byte RIFF/WAVE header for 16-bit PCM at our fixed params.
+
+    FORMAT/CHANNELS/RATE never change at runtime, so there is no need for the
+    wave module's bookkeeping - the header is just seven packed fields.
+    """
+    return (
+        b"RIFF"
+        + struct.pack("<I", 36 + data_size)
+        + b"WAVEfmt "
+        + struct.pack(
+            "<IHHIIHH", 16, 1, CHANNELS, RATE, RATE * CHANNELS * 2, CHANNELS * 2, 16
+        )
+        + b"data"
+        + struct.pack("<I", data_size)
+    )
+
+
 def record_audio():
     """Record audio continuously until stopped"""
-    global recording
+    global recording, recorded_wav
 
     audio = pyaudio.PyAudio()
 
     try:
+        # Capture runs in callback mode on PortAudio's own thread, pushing
+        # chunks into a deque ring. CPython's GIL makes deque.append and
+        # popleft atomic, so this single-producer/single-consumer handoff
+        # needs no lock, and capture never blocks on the Python side.
+        ring = collections.deque()
+
+        def _capture_callback(in_data, frame_count, time_info, status):
+            ring.append(in_data)
+            return (None, pyaudio.paContinue)
+
         stream = audio.open(
             format=FORMAT,
             channels=CHANNELS,
             rate=RATE,
             input=True,
-            frames_per_buffer=1024,
+            frames_per_buffer=CHUNK,
+            stream_callback=_capture_callback,
         )
 
-        frames = []
+        # Preallocate the whole capture buffer up front - no per-chunk list
+        # growth and no O(total) join when saving, and memory use is bounded
+        buf = bytearray(MAX_SECONDS * RATE * CHANNELS * 2)  # 16-bit samples
+        mv = memoryview(buf)
+        offset = 0
+        capped = False
+
+        stream.start_stream()
+
+        while recording and not capped:
+            while ring:
+                data = ring.popleft()
+                end = offset + len(data)
+                if end > len(buf):
+                    logger.warning(f"Recording reached {MAX_SECONDS}s cap, stopping")
+                    capped = True
+                    break
+                mv[offset:end] = data
+                offset = end
+            time.sleep(0.05)
+
+        stream.stop_stream()
 
-        while recording:
-            data = stream.read(1024)
-            frames.append(data)
+        # Drain anything the callback queued before the stream stopped
+        while ring and not capped:
+            data = ring.popleft()
+            end = offset + len(data)
+            if end > len(buf):
+                break
+            mv[offset:end] = data
+            offset = end
 
-        # Save recorded audio to file
-        with wave.open(AUDIO_FILE, "wb") as wf:
-            wf.setnchannels(CHANNELS)
-            wf.setsampwidth(audio.get_sample_size(FORMAT))
-            wf.setframerate(RATE)
-            wf.writeframes(b"".join(frames))
+        # Hand the finished WAV to the transcribe step in memory: precomputed
+        # RIFF header + raw samples, no disk round trip
+        recorded_wav = _wav_header(offset) + bytes(mv[:offset])
 
     except Exception as e:
         logger.error(f"Error during recording: {e}")
     finally:
         if "stream" in locals():
-            stream.stop_stream()
+            if stream.is_active():
+                stream.stop_stream()
             stream.close()
         audio.terminate()
 
 
 def type_text_uinput(text):
     """Type text using evdev/uinput (works on Wayland)"""
-    try:
-        from evdev import UInput, ecodes as e
-
-        # Comprehensive key mapping for all common characters
-        KEY_MAP = {
-            # Letters
-            "a": e.KEY_A,
-            "b": e.KEY_B,
-            "c": e.KEY_C,
-            "d": e.KEY_D,
-            "e": e.KEY_E,
-            "f": e.KEY_F,
-            "g": e.KEY_G,
-            "h": e.KEY_H,
-            "i": e.KEY_I,
-            "j": e.KEY_J,
-            "k": e.KEY_K,
-            "l": e.KEY_L,
-            "m": e.KEY_M,
-            "n": e.KEY_N,
-            "o": e.KEY_O,
-            "p": e.KEY_P,
-            "q": e.KEY_Q,
-            "r": e.KEY_R,
-            "s": e.KEY_S,
-            "t": e.KEY_T,
-            "u": e.KEY_U,
-            "v": e.KEY_V,
-            "w": e.KEY_W,
-            "x": e.KEY_X,
-            "y": e.KEY_Y,
-            "z": e.KEY_Z,
-            # Numbers
-            "0": e.KEY_0,
-            "1": e.KEY_1,
-            "2": e.KEY_2,
-            "3": e.KEY_3,
-            "4": e.KEY_4,
-            "5": e.KEY_5,
-            "6": e.KEY_6,
-            "7": e.KEY_7,
-            "8": e.KEY_8,
-            "9": e.KEY_9,
-            # Basic punctuation (no shift)
-            " ": e.KEY_SPACE,
-            ".": e.KEY_DOT,
-            ",": e.KEY_COMMA,
-            "-": e.KEY_MINUS,
-            "=": e.KEY_EQUAL,
-            "[": e.KEY_LEFTBRACE,
-            "]": e.KEY_RIGHTBRACE,
-            ";": e.KEY_SEMICOLON,
-            "'": e.KEY_APOSTROPHE,
-            "\\": e.KEY_BACKSLASH,
-            "/": e.KEY_SLASH,
-            "`": e.KEY_GRAVE,
-        }
-
-        # Characters that require shift key (base key mapping)
-        SHIFT_KEY_MAP = {
-            "!": e.KEY_1,
-            "@": e.KEY_2,
-            "#": e.KEY_3,
-            "$": e.KEY_4,
-            "%": e.KEY_5,
-            "^": e.KEY_6,
-            "&": e.KEY_7,
-            "*": e.KEY_8,
-            "(": e.KEY_9,
-            ")": e.KEY_0,
-            "_": e.KEY_MINUS,
-            "+": e.KEY_EQUAL,
-            "{": e.KEY_LEFTBRACE,
-            "}": e.KEY_RIGHTBRACE,
-            ":": e.KEY_SEMICOLON,
-            '"': e.KEY_APOSTROPHE,
-            "|": e.KEY_BACKSLASH,
-            "?": e.KEY_SLASH,
-            "~": e.KEY_GRAVE,
-            "<": e.KEY_COMMA,
-            ">": e.KEY_DOT,
-        }
-
-        SHIFT_CHARS = set('ABCDEFGHIJKLMNOPQRSTUVWXYZ!@#$%^&*()_+{}|:"<>?')
+    if not _HAS_EVDEV:
+        logger.error(
+            "evdev not installed. Install with: pip install evdev --break-system-packages"
+        )
+        return False
 
+    try:
         ui = UInput()
         time.sleep(0.1)  # Give time for uinput to initialize
 
@@ -531,38 +775,32 @@ def type_text_uinput(text):
         skipped_count = 0
 
         for char in text:
-            lower_char = char.lower()
-            need_shift = char in SHIFT_CHARS
+            code = ord(char)
+            entry = CHAR_TABLE[code] if code < 128 else None
+            if entry is None:
+                skipped_count += 1
+                logger.debug(f"Skipped character: {char!r} (ord: {code})")
+                continue
+            key, need_shift = entry
+
+            # Emit the whole press/release sequence, then flush once - the
+            # kernel preserves evdev event ordering within a single report,
+            # so per-event syn() calls are unnecessary overhead
+            if need_shift:
+                ui.write(_e.EV_KEY, _e.KEY_LEFTSHIFT, 1)
 
-            # Check shift characters first
-            if char in SHIFT_KEY_MAP:
-                key = SHIFT_KEY_MAP[char]
-                need_shift = True
-            else:
-                key = KEY_MAP.get(lower_char)
-                if not key:
-                    skipped_count += 1
-                    logger.debug(f"Skipped character: {char!r} (ord: {ord(char)})")
-                    continue
+            ui.write(_e.EV_KEY, key, 1)  # Key down
+            ui.write(_e.EV_KEY, key, 0)  # Key up
 
-            # Press shift if needed
             if need_shift:
-                ui.write(e.EV_KEY, e.KEY_LEFTSHIFT, 1)
-                ui.syn()
+                ui.write(_e.EV_KEY, _e.KEY_LEFTSHIFT, 0)
 
-            # Press and release the key
-            ui.write(e.EV_KEY, key, 1)  # Key down
             ui.syn()
-            ui.write(e.EV_KEY, key, 0)  # Key up
-            ui.syn()
-
-            # Release shift if it was pressed
-            if need_shift:
-                ui.write(e.EV_KEY, e.KEY_LEFTSHIFT, 0)
-                ui.syn()
 
             typed_count += 1
-            time.sleep(0.01)  # Small delay between characters
+            # Tiny breather every 32 chars so slow clients don't drop keys
+            if typed_count % 32 == 0:
+                time.sleep(0.001)
 
         ui.close()
 
@@ -573,11 +811,6 @@ def type_text_uinput(text):
 
         return True
 
-    except ImportError:
-        logger.error(
-            "evdev not installed. Install with: pip install evdev --break-system-packages"
-        )
-        return False
     except PermissionError:
         logger.error(
             "Permission denied for /dev/uinput. Run: sudo chmod 666 /dev/uinput"
@@ -588,69 +821,80 @@ def type_text_uinput(text):
         return False
 
 
+def _copy_clipboard(text: str) -> bool:
+    """Copy text to the Wayland clipboard; True on success."""
+    if not _HAS_WL_COPY:
+        return False
+    try:
+        subprocess.run(["wl-copy"], input=text.encode(), check=True, timeout=2)
+        return True
+    except (subprocess.TimeoutExpired, subprocess.CalledProcessError):
+        logger.warning("Could not copy to clipboard")
+        return False
+
+
 def type_text_wayland(text):
     """Type text using Wayland-compatible methods with fallbacks"""
 
     # Always copy to clipboard for easy paste
-    try:
-        subprocess.run(["wl-copy"], input=text.encode(), check=True, timeout=2)
-    except (
-        FileNotFoundError,
-        subprocess.TimeoutExpired,
-        subprocess.CalledProcessError,
-    ):
-        logger.warning("Could not copy to clipboard")
+    clipboard_ok = _copy_clipboard(text)
 
-    # Check if text contains non-ASCII characters (like Bengali)
-    is_non_ascii = any(ord(c) > 127 for c in text)
+    # Method 1: clipboard paste - one keystroke regardless of text length,
+    # and the only method that handles non-ASCII (like Bengali) reliably
+    if clipboard_ok:
+        if _HAS_WTYPE:
+            try:
+                result = subprocess.run(
+                    ["wtype", "-M", "ctrl", "-P", "v", "-m", "ctrl"],
+                    capture_output=True,
+                    timeout=2,
+                )
+                if result.returncode == 0:
+                    return True
+            except subprocess.TimeoutExpired:
+                pass
+        if _HAS_YDOTOOL:
+            try:
+                result = subprocess.run(
+                    ["ydotool", "key", "29:1", "47:1", "29:0", "47:0"],
+                    capture_output=True,
+                    timeout=2,
+                )
+                if result.returncode == 0:
+                    return True
+            except subprocess.TimeoutExpired:
+                pass
+
+    # The per-keystroke fallbacks below can only produce ASCII, so for
+    # non-ASCII text (like Bengali) stop here - the clipboard already has it
+    if any(ord(c) > 127 for c in text):
+        feedback("done", "Text in clipboard (paste failed)")
+        return False
 
-    # For non-ASCII (Bengali), use clipboard-based typing directly
-    if is_non_ascii:
-        logger.info("Non-ASCII text detected, using clipboard paste")
+    # Method 2: Try wtype
+    if _HAS_WTYPE:
         try:
-            subprocess.run(["wtype", "-M", "ctrl", "-P", "v", "-m", "ctrl"], timeout=2)
-            return True
-        except (FileNotFoundError, subprocess.TimeoutExpired):
+            result = subprocess.run(["wtype", text], capture_output=True, timeout=5)
+            if result.returncode == 0:
+                return True
+        except subprocess.TimeoutExpired:
             pass
+
+    # Method 3: Try ydotool
+    if _HAS_YDOTOOL:
         try:
-            subprocess.run(
-                ["ydotool", "key", "29:1", "47:1", "29:0", "47:0"], timeout=2
+            result = subprocess.run(
+                ["ydotool", "type", text], capture_output=True, timeout=5
             )
-            return True
-        except (FileNotFoundError, subprocess.TimeoutExpired):
+            if result.returncode == 0:
+                return True
+        except subprocess.TimeoutExpired:
             pass
-        feedback("done", "Text in clipboard (paste failed)")
-        return False
 
-    # Method 1: Try uinput (most reliable for Wayland) for ASCII text
+    # Method 4: uinput per-char typing as the last resort
     if type_text_uinput(text):
         return True
 
-    # Method 2: Try wtype
-    try:
-        result = subprocess.run(["wtype", text], capture_output=True, timeout=5)
-        if result.returncode == 0:
-            return True
-    except (FileNotFoundError, subprocess.TimeoutExpired):
-        pass
-
-    # Method 3: Try ydotool
-    try:
-        result = subprocess.run(
-            ["ydotool", "type", text], capture_output=True, timeout=5
-        )
-        if result.returncode == 0:
-            return True
-    except (FileNotFoundError, subprocess.TimeoutExpired):
-        pass
-
-    # Method 4: Try wl-clipboard + paste
-    try:
-        subprocess.run(["wtype", "-M", "ctrl", "-P", "v", "-m", "ctrl"], timeout=2)
-        return True
-    except (FileNotFoundError, subprocess.TimeoutExpired):
-        pass
-
     # If all methods fail, clipboard already has the text
     logger.error(
         "No typing method worked. Please ensure /dev/uinput has permissions: sudo chmod 666 /dev/uinput"
@@ -659,9 +903,162 @@ def type_text_wayland(text):
     return False
 
 
+def _warm_clients():
+    """Pre-build Gemini clients for all keys while the user is speaking.
+
+    Best-effort daemon-thread work: each client gets one tiny API call so
+    DNS resolution and the TLS handshake happen during recording, not at
+    the start of transcription.
+    """
+    for key in list(api_key_manager.api_keys):
+        try:
+            client = api_key_manager.get_client(key)
+            client.models.list(config={"page_size": 1})
+        except Exception as e:
+            logger.debug(f"Client warm-up failed: {e}")
+
+
+def _make_audio_part(client, wav_bytes: bytes):
+    """Build the audio content part, inline for short clips."""
+    if len(wav_bytes) < INLINE_AUDIO_LIMIT:
+        return types.Part.from_bytes(data=wav_bytes, mime_type="audio/wav")
+    # Too large to inline - spill to disk for the Files API upload path
+    with open(AUDIO_FILE, "wb") as f:
+        f.write(wav_bytes)
+    return client.files.upload(file=AUDIO_FILE)
+
+
+def _do_transcribe(key: str, model: str, prompt: str, wav_bytes: bytes) -> Optional[str]:
+    """Run a single transcription request against one key/model pair."""
+    client = api_key_manager.get_client(key)
+
+    response = client.models.generate_content(
+        model=model,
+        contents=[
+            prompt,
+            _make_audio_part(client, wav_bytes),
+        ],
+    )
+    return response.text
+
+
+class StreamTypingError(Exception):
+    """A streaming transcription failed after part of it was already typed.
+
+    Carries the original error plus the typed prefix so the retry loop can
+    avoid re-typing (and thus duplicating) what is already on screen.
+    """
+
+    def __init__(self, cause: Exception, typed_text: str):
+        super().__init__(str(cause))
+        self.cause = cause
+        self.typed_text = typed_text
+
+
+def _stream_transcribe(key: str, model: str, prompt: str, wav_bytes: bytes):
+    """Stream a transcription, typing completed sentences as they arrive.
+
+    Typing overlaps the remainder of the generation, so the first words land
+    on screen at first-sentence latency instead of full-transcript latency.
+    Returns (full_text, typed_ok) where typed_ok is True when every flushed
+    piece was typed successfully. If the stream dies after text has already
+    been flushed, raises StreamTypingError instead of the raw error.
+    """
+    client = api_key_manager.get_client(key)
+
+    stream = client.models.generate_content_stream(
+        model=model,
+        contents=[
+            prompt,
+            _make_audio_part(client, wav_bytes),
+        ],
+    )
+
+    pieces = []
+    pending = ""
+    typed_ok = True
+    emitted = ""  # everything already flushed to the screen
+
+    try:
+        for chunk in stream:
+            if not chunk.text:
+                continue
+            pieces.append(chunk.text)
+            pending += chunk.text
+            # Flush up to the last sentence boundary seen so far. Trailing
+            # whitespace is held back in the buffer so an end-of-transcript
+            # newline is never typed as Enter (mid-text newlines still are).
+            cut = max(pending.rfind(c) for c in ".!?\n")
+            if cut != -1:
+                head = pending[: cut + 1]
+                flush = head.rstrip()
+                pending = head[len(flush) :] + pending[cut + 1 :]
+                if flush:
+                    typed_ok = type_text_wayland(flush) and typed_ok
+                    emitted += flush
+    except Exception as e:
+        if emitted:
+            raise StreamTypingError(e, emitted) from e
+        raise
+
+    # Final flush for anything after the last sentence boundary
+    pending = pending.rstrip()
+    if pending:
+        typed_ok = type_text_wayland(pending) and typed_ok
+        emitted += pending
+
+    full_text = "".join(pieces)
+
+    # Each flush overwrote the clipboard with just that piece; restore the
+    # guarantee that the clipboard ends up holding the whole transcript
+    if emitted:
+        _copy_clipboard(full_text.strip())
+
+    return full_text, typed_ok
+
+
+def _race_transcribe(primary_key, model, prompt, wav_bytes):
+    """Race the same request across two API keys; first success wins.
+
+    Returns (text, winning_key). If every racer fails, re-raises the last
+    exception so the caller's retry logic treats it like a normal failure.
+    """
+    keys = [primary_key]
+    # Pick one more distinct available key to race against
+    for _ in range(5):
+        other = api_key_manager.get_key()
+        if other and other != primary_key:
+            keys.append(other)
+            break
+
+    # No context manager here: its implicit shutdown(wait=True) would block
+    # on the losing racer - the slow request racing exists to hide
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(keys))
+    try:
+        futures = {
+            executor.submit(_do_transcribe, key, model, prompt, wav_bytes): key
+            for key in keys
+        }
+        last_error = None
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                text = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            return text, futures[future]
+    finally:
+        # Return immediately; the losing thread finishes (and is discarded)
+        # in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    raise last_error
+
+
 def transcribe_audio():
-    """Send audio file to Google Gemini for transcription with API key + model rotation."""
-    if not os.path.exists(AUDIO_FILE):
+    """Send the recorded audio to Google Gemini for transcription with API key + model rotation."""
+    wav_bytes = recorded_wav
+    if not wav_bytes:
         return
 
     # Calculate max retries based on available keys and models
@@ -679,6 +1076,13 @@ def transcribe_audio():
         )
         return
 
+    # Set prompt based on mode (fixed for the whole retry loop)
+    if BENGALI_MODE:
+        prompt = "Generate a transcript of the speech. Do not include any other text. Output only in grammatically correct Bengali (বাংলা). If you hear any language other than Bengali, translate it to Bengali."
+        logger.info("Bengali mode enabled")
+    else:
+        prompt = "Generate a transcript of the speech. Do not include any other text. Output only in grammatically correct english. IF YOU HEAR ANYTHING ELSE THAN ENGLISH, TRANSLATE IT TO ENGLISH."
+
     last_error = None
     attempt_count = 0
     max_attempts = total_combinations * 2  # Allow multiple full rotations
@@ -698,72 +1102,95 @@ def transcribe_audio():
         )
 
         try:
-            client = genai.Client(api_key=current_key)
-
-            myfile = client.files.upload(file=AUDIO_FILE)
-
-            # Set prompt based on mode
-            if BENGALI_MODE:
-                prompt = "Generate a transcript of the speech. Do not include any other text. Output only in grammatically correct Bengali (বাংলা). If you hear any language other than Bengali, translate it to Bengali."
-                logger.info("Bengali mode enabled")
+            if SPECULATIVE and api_key_manager.get_remaining_count() >= 2:
+                # Racing waits for the full transcript, so type afterwards
+                text, used_key = _race_transcribe(
+                    current_key, current_model, prompt, wav_bytes
+                )
+                typed = None
             else:
-                prompt = "Generate a transcript of the speech. Do not include any other text. Output only in grammatically correct english. IF YOU HEAR ANYTHING ELSE THAN ENGLISH, TRANSLATE IT TO ENGLISH."
-
-            response = client.models.generate_content(
-                model=current_model,
-                contents=[
-                    prompt,
-                    myfile,
-                ],
-            )
+                # Streaming path types sentences while the rest generates
+                text, typed = _stream_transcribe(
+                    current_key, current_model, prompt, wav_bytes
+                )
+                used_key = current_key
 
             # Mark the key and model as successful
-            api_key_manager.mark_success(current_key)
+            api_key_manager.mark_success(used_key)
             model_manager.mark_success(current_model)
 
-            if response.text:
-                # Strip any trailing whitespace/newlines that might cause Enter to be pressed
-                clean_text = response.text.strip()
+            if not text:
+                feedback("error", "No transcription received")
+                return
 
-                logger.info(
-                    f"Transcription successful with '{current_model}', text length: {len(clean_text)} characters"
-                )
+            # Strip any trailing whitespace/newlines that might cause Enter to be pressed
+            clean_text = text.strip()
 
+            # Silence usually comes back as empty/whitespace - skip the whole
+            # typing pipeline rather than opening uinput for nothing
+            if not clean_text:
+                feedback("done", "(no speech detected)")
+                return
+
+            logger.info(
+                f"Transcription successful with '{current_model}', text length: {len(clean_text)} characters"
+            )
+
+            if typed is None:
                 # Use Wayland-compatible typing
-                if type_text_wayland(clean_text):
-                    feedback("done", clean_text)
-                else:
-                    feedback("error", "Failed to type text")
+                typed = type_text_wayland(clean_text)
+
+            if typed:
+                feedback("done", clean_text)
             else:
-                feedback("error", "No transcription received")
+                feedback("error", "Failed to type text")
             return  # Success, exit the retry loop
 
         except Exception as e:
+            # A stream can die mid-generation after sentences were already
+            # typed; classify on the underlying error, but remember that
+            # output was emitted so we never retry and re-type all of it
+            typed_prefix = ""
+            if isinstance(e, StreamTypingError):
+                typed_prefix = e.typed_text
+                e = e.cause
             last_error = e
-            error_str = str(e).lower()
-
-            # Check for rate limit or server errors (403, 429, 5xx, 502, 529, etc.)
-            is_retryable = any(
-                code in error_str
-                for code in [
-                    "403",
-                    "429",
-                    "500",
-                    "502",
-                    "503",
-                    "504",
-                    "529",
-                    "599",
-                    "rate limit",
-                    "quota",
-                    "overloaded",
-                    "timeout",
-                ]
-            )
+
+            # Check for rate limit or server errors (403, 429, 5xx, 529, etc.)
+            # preferring the structured status code the SDK attaches to API
+            # errors - the substring scan can false-positive on e.g. "500"
+            # appearing anywhere in a long message, so it's only a fallback
+            status = getattr(e, "code", None) or getattr(e, "status_code", None)
+            if status is not None:
+                is_retryable = status in {403, 429, 500, 502, 503, 504, 529, 599}
+            elif isinstance(e, (TimeoutError, ConnectionError)):
+                is_retryable = True
+            else:
+                error_str = str(e).lower()
+                is_retryable = any(
+                    code in error_str
+                    for code in [
+                        "403",
+                        "429",
+                        "500",
+                        "502",
+                        "503",
+                        "504",
+                        "529",
+                        "599",
+                        "rate limit",
+                        "quota",
+                        "overloaded",
+                        "timeout",
+                    ]
+                )
 
             if is_retryable:
-                # Mark both key and model as failed
-                api_key_manager.mark_failed(current_key)
+                # Mark both key and model as failed. A 403 PERMISSION_DENIED
+                # is retryable in the sense that another key may work, but it
+                # condemns this key - give it the permanent cooldown instead
+                # of the 30s one before rotating
+                api_key_manager.mark_failed(current_key, permanent=status == 403)
                 model_manager.mark_failed(current_model)
 
                 remaining_keys = api_key_manager.get_remaining_count()
@@ -773,6 +1200,15 @@ def transcribe_audio():
                     f"API error (retryable): {e}. Remaining: {remaining_keys} keys, {remaining_models} models"
                 )
 
+                if typed_prefix:
+                    # Part of the transcript is already on screen; a retry
+                    # would start the transcript over and duplicate it
+                    logger.error(
+                        f"Stream failed after typing {len(typed_prefix)} characters; not retrying"
+                    )
+                    feedback("error", "Transcription interrupted mid-typing")
+                    return
+
                 if remaining_keys > 0 and remaining_models > 0:
                     time.sleep(0.3)  # Brief pause before retrying
                     continue
@@ -782,7 +1218,18 @@ def transcribe_audio():
                     )
                     break
             else:
-                # Non-retryable error (auth, invalid request, etc.)
+                # Non-retryable error (auth, invalid request, etc.). Only an
+                # auth-class failure says anything about the key itself - a
+                # 400/404 (e.g. an unknown preview model) must not take the
+                # key out of rotation for good
+                # (403s are classified retryable above and never reach here)
+                error_str = str(e).lower()
+                is_auth_error = status == 401 or (
+                    status is None
+                    and ("unauthenticated" in error_str or "api key" in error_str)
+                )
+                if is_auth_error:
+                    api_key_manager.mark_failed(current_key, permanent=True)
                 logger.error(f"Non-retryable API error: {e}")
                 feedback("error", f"API Error: {str(e)[:100]}")
                 return
@@ -819,6 +1266,10 @@ def main():
     recording = True
     record_thread = threading.Thread(target=record_audio)
     record_thread.start()
+
+    # Use the recording time to warm up clients/connections (best effort)
+    threading.Thread(target=_warm_clients, daemon=True).start()
+
     if BENGALI_MODE:
         feedback("start", "Bengali Mode - Speak in Bengali")
     else:
@@ -828,7 +1279,7 @@ def main():
     record_thread.join()
 
     # Transcribe the recorded audio
-    if os.path.exists(AUDIO_FILE):
+    if recorded_wav:
         transcribe_audio()
 
     cleanup_audio_file()